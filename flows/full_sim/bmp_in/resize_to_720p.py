@@ -5,11 +5,19 @@
 将任意尺寸的图像缩放到1280x720分辨率的24位BMP格式
 """
 
+import PIL
 from PIL import Image
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import io
 import os
 import sys
 
-def resize_to_720p(input_path, output_path=None, target_size=(1280, 720)):
+# 文件数少于该值时串行处理，避免进程池启动开销
+PARALLEL_MIN_FILES = 4
+
+def resize_to_720p(input_path, output_path=None, target_size=(1280, 720),
+                   resample=Image.Resampling.BILINEAR, verify=False):
     """
     将图像缩放到指定分辨率并保存为BMP
     
@@ -17,6 +25,10 @@ def resize_to_720p(input_path, output_path=None, target_size=(1280, 720)):
         input_path: 输入图像文件路径
         output_path: BMP输出文件路径（可选，默认覆盖原文件）
         target_size: 目标分辨率 (宽, 高)
+        resample: 重采样滤波器，默认BILINEAR；输出图像送入Verilog仿真
+                  并经CLAHE处理，画质差异不可见，需要更高质量时可传
+                  Image.Resampling.LANCZOS
+        verify: 为True时先编码到内存并解析校验尺寸/模式，再写入文件
     
     返回:
         True: 转换成功
@@ -34,10 +46,10 @@ def resize_to_720p(input_path, output_path=None, target_size=(1280, 720)):
             base_name = os.path.splitext(input_path)[0]
             output_path = base_name + '_720p.bmp'
         
-        # 缩放图像（使用高质量的Lanczos重采样）
+        # 缩放图像
         if img.size != target_size:
             print(f"  缩放: {img.size} -> {target_size}")
-            img = img.resize(target_size, Image.Resampling.LANCZOS)
+            img = img.resize(target_size, resample)
         else:
             print(f"  尺寸已是目标尺寸，无需缩放")
         
@@ -47,21 +59,37 @@ def resize_to_720p(input_path, output_path=None, target_size=(1280, 720)):
             img = img.convert('RGB')
         elif img.mode == 'RGBA':
             print(f"  转换模式: {img.mode} -> RGB (去除Alpha通道)")
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            background.paste(img, mask=img.split()[3])
-            img = background
+            alpha = img.getchannel('A')
+            if alpha.getextrema() == (255, 255):
+                # 完全不透明，无需与背景合成
+                img = img.convert('RGB')
+            else:
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=alpha)
+                img = background
         elif img.mode != 'RGB':
             print(f"  转换模式: {img.mode} -> RGB")
             img = img.convert('RGB')
         
-        # 保存为24位BMP
-        img.save(output_path, 'BMP')
+        # 保存为24位BMP；保存失败会直接抛出异常
+        if verify:
+            # 需要审计时先编码到内存，从内存中解析验证后再写盘，无需重新读取文件
+            buf = io.BytesIO()
+            img.save(buf, 'BMP')
+            data = buf.getvalue()
+            with Image.open(io.BytesIO(data)) as bmp_img:
+                if bmp_img.size != img.size or bmp_img.mode != 'RGB':
+                    print(f"验证失败: 编码结果为 {bmp_img.size} {bmp_img.mode}")
+                    return False
+            with open(output_path, 'wb') as f:
+                f.write(data)
+            print(f"  验证BMP文件大小: {len(data)} 字节")
+        else:
+            img.save(output_path, 'BMP')
         print(f"成功保存BMP: {output_path}")
         
-        # 验证保存的BMP文件
-        bmp_img = Image.open(output_path)
-        print(f"  验证BMP尺寸: {bmp_img.size}")
-        print(f"  验证BMP模式: {bmp_img.mode}")
+        print(f"  BMP尺寸: {img.size}")
+        print(f"  BMP模式: {img.mode}")
         
         return True
         
@@ -69,7 +97,16 @@ def resize_to_720p(input_path, output_path=None, target_size=(1280, 720)):
         print(f"转换失败 ({input_path}): {e}")
         return False
 
-def batch_resize(input_dir, output_dir=None, target_size=(1280, 720), extensions=None):
+def _resize_worker(args):
+    """进程池工作函数：缩放单个文件并收集其输出，由主进程统一打印"""
+    input_path, output_path, target_size, resample = args
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        ok = resize_to_720p(input_path, output_path, target_size, resample)
+    return ok, log.getvalue()
+
+def batch_resize(input_dir, output_dir=None, target_size=(1280, 720), extensions=None,
+                 resample=Image.Resampling.BILINEAR):
     """
     批量缩放目录下的所有图像文件
     
@@ -78,6 +115,7 @@ def batch_resize(input_dir, output_dir=None, target_size=(1280, 720), extensions
         output_dir: BMP输出目录（可选，默认与输入同目录）
         target_size: 目标分辨率 (宽, 高)
         extensions: 要处理的文件扩展名列表（可选）
+        resample: 重采样滤波器，见resize_to_720p
     """
     if output_dir is None:
         output_dir = input_dir
@@ -91,11 +129,13 @@ def batch_resize(input_dir, output_dir=None, target_size=(1280, 720), extensions
     if extensions is None:
         extensions = ['.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff']
     
-    # 查找所有支持的图像文件
-    image_files = []
-    for ext in extensions:
-        image_files.extend([f for f in os.listdir(input_dir) 
-                          if f.lower().endswith(ext.lower()) and '_720p' not in f.lower()])
+    # 单次遍历目录查找所有支持的图像文件（DirEntry缓存了文件类型，无需额外stat）
+    exts = {e.lower() for e in extensions}
+    with os.scandir(input_dir) as it:
+        image_files = [e.name for e in it
+                       if e.is_file()
+                       and os.path.splitext(e.name)[1].lower() in exts
+                       and '_720p' not in e.name.lower()]
     
     if not image_files:
         print(f"在 {input_dir} 目录下没有找到支持的图像文件")
@@ -108,16 +148,27 @@ def batch_resize(input_dir, output_dir=None, target_size=(1280, 720), extensions
     
     print(f"\n开始缩放到 {target_size[0]}x{target_size[1]}...\n")
     
+    tasks = [(os.path.join(input_dir, f),
+              os.path.join(output_dir, os.path.splitext(f)[0] + '_720p.bmp'),
+              target_size, resample)
+             for f in image_files]
+    
+    # 各文件相互独立，PIL的重采样为单线程，文件数较多时使用进程池并行缩放
     success_count = 0
-    for i, img_file in enumerate(image_files, 1):
-        input_path = os.path.join(input_dir, img_file)
-        bmp_file = os.path.splitext(img_file)[0] + '_720p.bmp'
-        output_path = os.path.join(output_dir, bmp_file)
-        
-        print(f"[{i}/{len(image_files)}]", end=" ")
-        if resize_to_720p(input_path, output_path, target_size):
-            success_count += 1
-        print()
+    if len(tasks) < PARALLEL_MIN_FILES:
+        results = map(_resize_worker, tasks)
+        pool = contextlib.nullcontext()
+    else:
+        pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+        results = pool.map(_resize_worker, tasks)
+    
+    with pool:
+        for i, (ok, log) in enumerate(results, 1):
+            print(f"[{i}/{len(image_files)}]", end=" ")
+            print(log, end="")
+            if ok:
+                success_count += 1
+            print()
     
     print(f"\n转换完成: {success_count}/{len(image_files)} 成功")
     return success_count
@@ -125,6 +176,10 @@ def batch_resize(input_dir, output_dir=None, target_size=(1280, 720), extensions
 def main():
     """主函数：处理命令行参数"""
     
+    # Pillow-SIMD的版本号带有.postN后缀，其resize使用AVX2加速
+    if '.post' in PIL.__version__:
+        print(f"检测到 Pillow-SIMD {PIL.__version__}，缩放将使用SIMD加速")
+    
     # 如果提供了命令行参数
     if len(sys.argv) > 1:
         input_arg = sys.argv[1]
@@ -4,31 +4,27 @@
 分析剩余的分块效应，寻找进一步优化方案
 """
 
+import argparse
 import numpy as np
 from PIL import Image
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.rcParams['font.sans-serif'] = ['SimHei']
-matplotlib.rcParams['axes.unicode_minus'] = False
 
 # 模拟当前的权重计算
 def calc_current_weight(dx):
-    """当前修复后的权重计算"""
-    mult = dx * 819
-    offset = mult >> 10
-    if mult < 0:
-        offset = -((-mult) >> 10)
-    result = 128 + offset
-    return max(0, min(255, result))
+    """
+    当前修复后的权重计算（支持标量或数组输入）
+    NumPy的 >> 对负数向下取整，与Verilog有符号算术右移 $signed(x) >>> 10 一致
+    """
+    mult = np.asarray(dx, dtype=np.int32) * 819
+    return np.clip(128 + (mult >> 10), 0, 255)
 
 # 理想的权重计算
 def calc_ideal_weight(dx, tile_width=320):
-    """理想的权重计算（浮点）"""
+    """理想的权重计算（浮点，支持标量或数组输入）"""
     # wx应该在tile中心=128，左边界=0，右边界=256(饱和到255)
-    wx = 128 + (dx * 256.0 / tile_width)
-    return max(0, min(255, int(wx)))
+    wx = 128 + (np.asarray(dx) * 256.0 / tile_width)
+    return np.clip(wx.astype(int), 0, 255)
 
-def analyze_weight_precision():
+def analyze_weight_precision(plot=False):
     """分析权重计算的精度问题"""
     print("=" * 80)
     print("权重精度分析 - 寻找改进空间")
@@ -43,8 +39,8 @@ def analyze_weight_precision():
     
     max_error = 0
     for dx in critical_dx:
-        wx_current = calc_current_weight(dx)
-        wx_ideal = calc_ideal_weight(dx)
+        wx_current = int(calc_current_weight(dx))
+        wx_ideal = int(calc_ideal_weight(dx))
         error = abs(wx_current - wx_ideal)
         error_pct = (error / 256) * 100
         max_error = max(max_error, error)
@@ -61,10 +57,28 @@ def analyze_weight_precision():
     
     print(f"\n最大误差: {max_error} ({(max_error/256)*100:.2f}%)")
     
+    if plot:
+        plot_weight_precision()
+
+def plot_weight_precision():
+    """绘制权重曲线与误差分布（仅在 --plot 时调用）"""
+    # 仅在绘图时导入matplotlib，使用无GUI的Agg后端
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    matplotlib.rcParams['font.sans-serif'] = ['SimHei']
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    
+    # 一次性计算覆盖全部绘图区间的权重，各子图按区间切片复用
+    dx_full = np.arange(-170, 170)
+    wx_current_full = calc_current_weight(dx_full)
+    wx_ideal_full = calc_ideal_weight(dx_full)
+    
     # 可视化权重曲线
-    dx_range = np.arange(-160, 160)
-    wx_current = [calc_current_weight(dx) for dx in dx_range]
-    wx_ideal = [calc_ideal_weight(dx) for dx in dx_range]
+    mask = (dx_full >= -160) & (dx_full < 160)
+    dx_range = dx_full[mask]
+    wx_current = wx_current_full[mask]
+    wx_ideal = wx_ideal_full[mask]
     
     fig, axes = plt.subplots(2, 2, figsize=(14, 10))
     
@@ -80,7 +94,7 @@ def analyze_weight_precision():
     axes[0, 0].grid(True, alpha=0.3)
     
     # 误差分布
-    errors = [abs(c - i) for c, i in zip(wx_current, wx_ideal)]
+    errors = np.abs(wx_current - wx_ideal)
     axes[0, 1].plot(dx_range, errors, 'r-', linewidth=2)
     axes[0, 1].axhline(1, color='orange', linestyle='--', label='1 LSB')
     axes[0, 1].axhline(2, color='red', linestyle='--', label='2 LSB')
@@ -91,9 +105,10 @@ def analyze_weight_precision():
     axes[0, 1].grid(True, alpha=0.3)
     
     # tile边界附近的详细分析
-    boundary_dx = np.arange(-170, -140)  # 左边界附近
-    boundary_wx_current = [calc_current_weight(dx) for dx in boundary_dx]
-    boundary_wx_ideal = [calc_ideal_weight(dx) for dx in boundary_dx]
+    mask_l = (dx_full >= -170) & (dx_full < -140)  # 左边界附近
+    boundary_dx = dx_full[mask_l]
+    boundary_wx_current = wx_current_full[mask_l]
+    boundary_wx_ideal = wx_ideal_full[mask_l]
     
     axes[1, 0].plot(boundary_dx, boundary_wx_ideal, 'b-', linewidth=2, marker='o', label='理想')
     axes[1, 0].plot(boundary_dx, boundary_wx_current, 'r--', linewidth=2, marker='s', label='当前')
@@ -104,9 +119,10 @@ def analyze_weight_precision():
     axes[1, 0].grid(True, alpha=0.3)
     
     # 右边界附近
-    boundary_dx_r = np.arange(140, 170)
-    boundary_wx_current_r = [calc_current_weight(dx) for dx in boundary_dx_r]
-    boundary_wx_ideal_r = [calc_ideal_weight(dx) for dx in boundary_dx_r]
+    mask_r = (dx_full >= 140) & (dx_full < 170)
+    boundary_dx_r = dx_full[mask_r]
+    boundary_wx_current_r = wx_current_full[mask_r]
+    boundary_wx_ideal_r = wx_ideal_full[mask_r]
     
     axes[1, 1].plot(boundary_dx_r, boundary_wx_ideal_r, 'b-', linewidth=2, marker='o', label='理想')
     axes[1, 1].plot(boundary_dx_r, boundary_wx_current_r, 'r--', linewidth=2, marker='s', label='当前')
@@ -200,7 +216,12 @@ def suggest_improvements():
     print("\n" + "=" * 80)
 
 if __name__ == "__main__":
-    analyze_weight_precision()
+    parser = argparse.ArgumentParser(description="剩余分块效应分析")
+    parser.add_argument('--plot', action=argparse.BooleanOptionalAction, default=False,
+                        help="生成权重精度分析图 weight_precision_analysis.png（默认只输出指标）")
+    args = parser.parse_args()
+    
+    analyze_weight_precision(plot=args.plot)
     suggest_improvements()
     
     print("\n分析完成！")
@@ -5,6 +5,7 @@ BMP转十六进制文本文件（for Verilog $readmemh）
 """
 
 from PIL import Image
+import numpy as np
 import sys
 
 def bmp_to_hex(bmp_path, hex_path):
@@ -14,29 +15,36 @@ def bmp_to_hex(bmp_path, hex_path):
     """
     try:
         img = Image.open(bmp_path)
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
         
         width, height = img.size
         print(f"转换BMP: {bmp_path}")
         print(f"  尺寸: {width}x{height}")
         print(f"  总像素: {width*height}")
         
-        with open(hex_path, 'w') as f:
-            # 写入图像尺寸信息（注释）
-            f.write(f"// Image: {bmp_path}\n")
-            f.write(f"// Size: {width}x{height}\n")
-            f.write(f"// Format: BGR (Blue-Green-Red), 24-bit\n")
-            f.write(f"// Total pixels: {width*height}\n")
-            f.write(f"//\n")
-            
-            # 逐像素写入（从上到下，从左到右）
-            pixels = img.load()
-            for y in range(height):
-                for x in range(width):
-                    r, g, b = pixels[x, y]
-                    # BGR顺序，每个像素24位
-                    f.write(f"{b:02X}{g:02X}{r:02X}\n")
+        # 由PIL直接按BGR打包整幅图像的像素字节，省去convert和通道翻转
+        try:
+            raw_bgr = img.tobytes('raw', 'BGR')
+        except ValueError:
+            # 调色板/灰度等模式没有BGR打包方式，先转换为RGB
+            raw_bgr = img.convert('RGB').tobytes('raw', 'BGR')
+        hex_text = raw_bgr.hex().upper().encode('ascii')
+        
+        # 每6个字符（一个像素）后追加换行
+        hex_rows = np.empty((width * height, 7), dtype=np.uint8)
+        hex_rows[:, :6] = np.frombuffer(hex_text, dtype=np.uint8).reshape(-1, 6)
+        hex_rows[:, 6] = ord('\n')
+        
+        # 图像尺寸信息（注释），预先编码为字节
+        header = (f"// Image: {bmp_path}\n"
+                  f"// Size: {width}x{height}\n"
+                  f"// Format: BGR (Blue-Green-Red), 24-bit\n"
+                  f"// Total pixels: {width*height}\n"
+                  f"//\n")
+        
+        # 二进制模式+1MB缓冲，跳过文本编码层；像素数据（从上到下，从左到右）一次写入
+        with open(hex_path, 'wb', buffering=1 << 20) as f:
+            f.write(header.encode('utf-8'))
+            f.write(hex_rows.tobytes())
         
         print(f"成功生成HEX文件: {hex_path}")
         return True
@@ -5,6 +5,7 @@
 
 import struct
 import sys
+import numpy as np
 
 def check_bmp(filename):
     """检查BMP文件的头部信息和前几个像素值"""
@@ -52,16 +53,14 @@ def check_bmp(filename):
             row_size = ((width * bits_per_pixel // 8) + 3) & ~3
             print(f"✓ 每行字节数（对齐后）: {row_size}")
             
-            # 跳到像素数据
+            # 跳到像素数据，一次读入全部像素行（含行尾填充）
             f.seek(offset)
+            buf = f.read(row_size * abs(height))
             
             # 读取前10个像素（从最后一行开始，因为BMP是倒序存储）
             print(f"\n📊 前10个像素值（BGR格式，最后一行开始）：")
-            for i in range(min(10, width)):
-                pixel = f.read(3)
-                if len(pixel) < 3:
-                    break
-                b, g, r = pixel[0], pixel[1], pixel[2]
+            for i in range(min(10, width, len(buf) // 3)):
+                b, g, r = buf[3*i], buf[3*i + 1], buf[3*i + 2]
                 
                 # 计算YUV（使用testbench中的公式）
                 y = int((19595 * r + 38470 * g + 7471 * b + 32768) >> 16)
@@ -70,38 +69,38 @@ def check_bmp(filename):
             
             # 统计整个图像的亮度分布
             print(f"\n📈 图像统计分析：")
-            f.seek(offset)
             
-            y_sum = 0
-            y_min = 255
-            y_max = 0
-            zero_count = 0
             total_pixels = width * abs(height)
             
-            for row in range(abs(height)):
-                for col in range(width):
-                    pixel = f.read(3)
-                    if len(pixel) < 3:
-                        break
-                    b, g, r = pixel[0], pixel[1], pixel[2]
-                    y = int((19595 * r + 38470 * g + 7471 * b + 32768) >> 16)
-                    
-                    y_sum += y
-                    y_min = min(y_min, y)
-                    y_max = max(y_max, y)
-                    if y == 0:
-                        zero_count += 1
-                
-                # 跳过行尾填充
-                f.seek(offset + row_size * (row + 1))
+            # 文件可能未完全写入（仿真期间），只统计完整读取到的行
+            rows = min(abs(height), len(buf) // row_size)
+            counted_pixels = width * rows
+            if rows < abs(height):
+                print(f"  ⚠️  像素数据不完整：仅读取到 {rows}/{abs(height)} 行，以下统计基于已读取的行")
+            
+            # 去掉行尾填充后向量化计算Y
+            raw = np.frombuffer(buf, dtype=np.uint8, count=rows * row_size)
+            raw = raw.reshape(rows, row_size)
+            bgr = raw[:, :width * 3].reshape(rows, width, 3).astype(np.int32)
+            y = (19595 * bgr[..., 2] + 38470 * bgr[..., 1] + 7471 * bgr[..., 0] + 32768) >> 16
+            
+            # 单次遍历得到256级亮度直方图，再由直方图推导各项统计
+            hist = np.bincount(y.ravel(), minlength=256)
+            levels = np.flatnonzero(hist)
+            y_sum = int((hist * np.arange(256)).sum())
+            y_min = int(levels[0]) if levels.size else 255
+            y_max = int(levels[-1]) if levels.size else 0
+            zero_count = int(hist[0])
             
-            y_avg = y_sum / total_pixels if total_pixels > 0 else 0
+            y_avg = y_sum / counted_pixels if counted_pixels > 0 else 0
             
             print(f"  总像素数: {total_pixels}")
+            if counted_pixels != total_pixels:
+                print(f"  统计像素数: {counted_pixels}")
             print(f"  平均亮度(Y): {y_avg:.1f}")
             print(f"  最小亮度(Y): {y_min}")
             print(f"  最大亮度(Y): {y_max}")
-            print(f"  零亮度像素: {zero_count} ({100*zero_count/total_pixels:.2f}%)")
+            print(f"  零亮度像素: {zero_count} ({100*zero_count/max(counted_pixels, 1):.2f}%)")
             
             if y_avg < 10:
                 print(f"\n⚠️  警告：平均亮度非常低（{y_avg:.1f}），图像可能非常暗或几乎全黑！")
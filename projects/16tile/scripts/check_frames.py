@@ -1,11 +1,23 @@
 from PIL import Image
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
+def fast_mean(a):
+    # Integer accumulation avoids the implicit uint8 -> float64 promotion of a.mean()
+    return a.sum(dtype=np.uint64) / a.size
+
+def load_mean(path):
+    return fast_mean(np.asarray(Image.open(path)))
+
+paths = []
 for i in range(6):
-    inp = Image.open(f'bmp_test_results/input/input_frame {i}.bmp')
-    out = Image.open(f'bmp_test_results/output/output_frame {i}.bmp')
-    inp_arr = np.array(inp)
-    out_arr = np.array(out)
-    print(f'Frame {i}: Input Mean={inp_arr.mean():.1f}, Output Mean={out_arr.mean():.1f}, Ratio={out_arr.mean()/inp_arr.mean():.3f}')
+    paths.append(f'bmp_test_results/input/input_frame {i}.bmp')
+    paths.append(f'bmp_test_results/output/output_frame {i}.bmp')
 
+# PIL decode releases the GIL, so the 12 loads overlap in a thread pool
+with ThreadPoolExecutor() as ex:
+    means = list(ex.map(load_mean, paths))
 
+for i in range(6):
+    inp_mean, out_mean = means[2*i], means[2*i + 1]
+    print(f'Frame {i}: Input Mean={inp_mean:.1f}, Output Mean={out_mean:.1f}, Ratio={out_mean/inp_mean:.3f}')
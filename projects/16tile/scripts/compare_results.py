@@ -5,117 +5,91 @@
 检查分块效应是否消除
 """
 
+import argparse
+import functools
 import numpy as np
 from PIL import Image
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.rcParams['font.sans-serif'] = ['SimHei']
-matplotlib.rcParams['axes.unicode_minus'] = False
+
+# 整图显示的最大分辨率 (宽, 高)
+PLOT_MAX_SIZE = (1280, 720)
 
 def load_image(path):
-    """加载BMP图像"""
+    """加载并解码BMP图像，返回PIL Image，彩色/灰度数组均由其转换得到（只解码一次）"""
     try:
         img = Image.open(path)
-        return np.array(img)
+        img.load()
+        return img
     except Exception as e:
         print(f"无法加载图像 {path}: {e}")
         return None
 
-def detect_blocking_artifacts(img, tile_size=(320, 180)):
-    """检测分块效应 - 计算tile边界处的梯度"""
-    if len(img.shape) == 3:
-        # 转换为灰度
-        gray = np.mean(img, axis=2).astype(np.uint8)
-    else:
-        gray = img
-    
+@functools.lru_cache(maxsize=4)
+def _boundary_indices(h, w, tile_w, tile_h):
+    """预计算tile边界位置及两侧各2个像素的索引，按 (h, w, tile_w, tile_h) 缓存"""
+    assert tile_w >= 2 and tile_h >= 2, "tile尺寸至少为2像素"
+    # 边界两侧各取2个像素: 左/上为[-2, -1]，右/下为[0, 1]
+    offsets = np.array([-2, -1, 0, 1])
+    xs = np.arange(tile_w, w - 1, tile_w)
+    ys = np.arange(tile_h, h - 1, tile_h)
+    v_idx = xs[:, None] + offsets
+    h_idx = ys[:, None] + offsets
+    for arr in (xs, ys, v_idx, h_idx):
+        arr.setflags(write=False)
+    return xs, v_idx, ys, h_idx
+
+def detect_blocking_artifacts(gray, tile_size=(320, 180)):
+    """检测分块效应 - 计算tile边界处的梯度（输入为PIL convert('L')得到的灰度图）"""
     h, w = gray.shape
     tile_w, tile_h = tile_size
+    xs, v_idx, ys, h_idx = _boundary_indices(h, w, tile_w, tile_h)
+    
+    # 检测垂直边界 (X方向)，一次索引出所有边界两侧的列
+    cols = gray[:, v_idx]
+    left = cols[:, :, :2].mean(axis=(0, 2))
+    right = cols[:, :, 2:].mean(axis=(0, 2))
+    v_boundaries = list(zip(xs.tolist(), np.abs(right - left).tolist()))
     
-    # 检测垂直边界 (X方向)
-    v_boundaries = []
-    for x in range(tile_w, w, tile_w):
-        if x < w - 1:
-            # 计算边界两侧的梯度
-            left = gray[:, max(0, x-2):x]
-            right = gray[:, x:min(w, x+2)]
-            if left.size > 0 and right.size > 0:
-                gradient = np.abs(np.mean(right) - np.mean(left))
-                v_boundaries.append((x, gradient))
-    
-    # 检测水平边界 (Y方向)
-    h_boundaries = []
-    for y in range(tile_h, h, tile_h):
-        if y < h - 1:
-            # 计算边界两侧的梯度
-            top = gray[max(0, y-2):y, :]
-            bottom = gray[y:min(h, y+2), :]
-            if top.size > 0 and bottom.size > 0:
-                gradient = np.abs(np.mean(bottom) - np.mean(top))
-                h_boundaries.append((y, gradient))
+    # 检测水平边界 (Y方向)，一次索引出所有边界两侧的行
+    rows = gray[h_idx, :]
+    top = rows[:, :2, :].mean(axis=(1, 2))
+    bottom = rows[:, 2:, :].mean(axis=(1, 2))
+    h_boundaries = list(zip(ys.tolist(), np.abs(bottom - top).tolist()))
     
     return v_boundaries, h_boundaries, gray
 
-def compare_images():
-    """对比修复前后的图像"""
-    print("=" * 80)
-    print("CLAHE分块效应修复效果对比")
-    print("=" * 80)
-    
-    # 加载图像 (使用Frame 1，因为它应用了CLAHE增强)
-    output_path = "bmp_test_results/output/output_frame 1.bmp"
+def plot_blocking_analysis(img_fixed, gray, v_bounds, h_bounds):
+    """可视化分块效应分析结果（仅在 --plot 时调用）"""
+    # 仅在绘图时导入matplotlib，使用无GUI的Agg后端
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    matplotlib.rcParams['font.sans-serif'] = ['SimHei']
+    matplotlib.rcParams['axes.unicode_minus'] = False
     
-    img_fixed = load_image(output_path)
-    
-    if img_fixed is None:
-        print("无法加载修复后的图像！")
-        return
-    
-    print(f"\n图像尺寸: {img_fixed.shape}")
-    
-    # 检测分块效应
-    print("\n【修复后图像的分块效应分析】")
-    v_bounds, h_bounds, gray = detect_blocking_artifacts(img_fixed)
-    
-    print(f"\n垂直Tile边界 (X方向):")
-    print(f"位置(X) | 边界梯度")
-    print("-" * 40)
-    avg_v_gradient = 0
-    for x, grad in v_bounds:
-        print(f"  {x:4d}  |   {grad:6.2f}")
-        avg_v_gradient += grad
-    if len(v_bounds) > 0:
-        avg_v_gradient /= len(v_bounds)
-        print(f"\n平均垂直边界梯度: {avg_v_gradient:.2f}")
-    
-    print(f"\n水平Tile边界 (Y方向):")
-    print(f"位置(Y) | 边界梯度")
-    print("-" * 40)
-    avg_h_gradient = 0
-    for y, grad in h_bounds:
-        print(f"  {y:4d}  |   {grad:6.2f}")
-        avg_h_gradient += grad
-    if len(h_bounds) > 0:
-        avg_h_gradient /= len(h_bounds)
-        print(f"\n平均水平边界梯度: {avg_h_gradient:.2f}")
-    
-    # 可视化
     fig, axes = plt.subplots(2, 3, figsize=(18, 12))
     
+    # 整图仅用于显示，先缩放到不超过1280x720再交给imshow；
+    # extent保持原图坐标，tile边界线位置无需换算。梯度指标仍使用全分辨率数据
+    h, w = gray.shape
+    scale = min(1.0, PLOT_MAX_SIZE[0] / w, PLOT_MAX_SIZE[1] / h)
+    plot_size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    img_plot = np.asarray(Image.fromarray(img_fixed).resize(plot_size, Image.Resampling.BILINEAR))
+    gray_plot = np.asarray(Image.fromarray(gray).resize(plot_size, Image.Resampling.BILINEAR))
+    extent = (0, w, h, 0)
+    
     # 显示完整图像
-    axes[0, 0].imshow(img_fixed)
+    axes[0, 0].imshow(img_plot, extent=extent)
     axes[0, 0].set_title('修复后的输出图像 (Frame 1)', fontsize=14, fontweight='bold')
     axes[0, 0].axis('off')
     
     # 添加tile边界线
-    h, w = gray.shape
     for x in range(320, w, 320):
         axes[0, 0].axvline(x, color='r', linewidth=1, alpha=0.5)
     for y in range(180, h, 180):
         axes[0, 0].axhline(y, color='r', linewidth=1, alpha=0.5)
     
     # 显示灰度图
-    axes[0, 1].imshow(gray, cmap='gray')
+    axes[0, 1].imshow(gray_plot, cmap='gray', extent=extent)
     axes[0, 1].set_title('灰度图 (检查分块效应)', fontsize=14)
     axes[0, 1].axis('off')
     for x in range(320, w, 320):
@@ -177,6 +151,56 @@ def compare_images():
     plt.tight_layout()
     plt.savefig('blocking_artifact_analysis.png', dpi=150, bbox_inches='tight')
     print("\n分析结果图已保存: blocking_artifact_analysis.png")
+
+def compare_images(plot=False):
+    """对比修复前后的图像"""
+    print("=" * 80)
+    print("CLAHE分块效应修复效果对比")
+    print("=" * 80)
+    
+    # 加载图像 (使用Frame 1，因为它应用了CLAHE增强)
+    output_path = "bmp_test_results/output/output_frame 1.bmp"
+    
+    img_fixed = load_image(output_path)
+    
+    if img_fixed is None:
+        print("无法加载修复后的图像！")
+        return
+    
+    # 分块效应检测使用PIL转换的灰度图，彩色图仅在绘图时转换
+    gray_fixed = np.asarray(img_fixed.convert('L'))
+    bands = len(img_fixed.getbands())
+    shape = (img_fixed.height, img_fixed.width) + ((bands,) if bands > 1 else ())
+    print(f"\n图像尺寸: {shape}")
+    
+    # 检测分块效应
+    print("\n【修复后图像的分块效应分析】")
+    v_bounds, h_bounds, gray = detect_blocking_artifacts(gray_fixed)
+    
+    print(f"\n垂直Tile边界 (X方向):")
+    print(f"位置(X) | 边界梯度")
+    print("-" * 40)
+    avg_v_gradient = 0
+    for x, grad in v_bounds:
+        print(f"  {x:4d}  |   {grad:6.2f}")
+        avg_v_gradient += grad
+    if len(v_bounds) > 0:
+        avg_v_gradient /= len(v_bounds)
+        print(f"\n平均垂直边界梯度: {avg_v_gradient:.2f}")
+    
+    print(f"\n水平Tile边界 (Y方向):")
+    print(f"位置(Y) | 边界梯度")
+    print("-" * 40)
+    avg_h_gradient = 0
+    for y, grad in h_bounds:
+        print(f"  {y:4d}  |   {grad:6.2f}")
+        avg_h_gradient += grad
+    if len(h_bounds) > 0:
+        avg_h_gradient /= len(h_bounds)
+        print(f"\n平均水平边界梯度: {avg_h_gradient:.2f}")
+    
+    if plot:
+        plot_blocking_analysis(np.asarray(img_fixed), gray, v_bounds, h_bounds)
     
     # 评估修复效果
     print("\n" + "=" * 80)
@@ -209,8 +233,16 @@ def compare_images():
     print("=" * 80)
 
 if __name__ == "__main__":
-    compare_images()
-    print("\n分析完成！请查看生成的图像文件。")
+    parser = argparse.ArgumentParser(description="CLAHE分块效应分析")
+    parser.add_argument('--plot', action=argparse.BooleanOptionalAction, default=False,
+                        help="生成分析图 blocking_artifact_analysis.png（默认只输出指标）")
+    args = parser.parse_args()
+    
+    compare_images(plot=args.plot)
+    if args.plot:
+        print("\n分析完成！请查看生成的图像文件。")
+    else:
+        print("\n分析完成！")
 
 
 
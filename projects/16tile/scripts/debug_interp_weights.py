@@ -5,8 +5,8 @@ CLAHE插值权重验证脚本
 检查权重计算和插值效果
 """
 
+import argparse
 import numpy as np
-import matplotlib.pyplot as plt
 
 # 常量定义
 TILE_WIDTH = 320
@@ -29,12 +29,26 @@ def calc_weight_verilog(local_coord, is_x_axis):
         wy = (mult >> 10) & 0xFF
         return wy
 
+def calc_weight_verilog_vec(local_coord, is_x_axis):
+    """
+    calc_weight_verilog的数组版本，一次计算整段坐标的权重
+    """
+    mult = np.asarray(local_coord, dtype=np.int32) * (819 if is_x_axis else 1456)
+    return (mult >> 10) & 0xFF
+
 def calc_weight_ideal(local_coord, tile_size):
     """
     理想的权重计算 (浮点)
     """
     return int((local_coord * 256) / tile_size)
 
+# 插值权重对查找表，按local坐标索引：[0]为 256-w（左/上tile），[1]为 w（右/下tile）
+# 角权重为 WY_PAIR[qy, local_y] * WX_PAIR[qx, local_x]，与Verilog ROM的布局一一对应
+_WX_LUT = calc_weight_verilog_vec(np.arange(TILE_WIDTH), True).astype(np.uint16)
+_WY_LUT = calc_weight_verilog_vec(np.arange(TILE_HEIGHT), False).astype(np.uint16)
+WX_PAIR = np.stack([256 - _WX_LUT, _WX_LUT])
+WY_PAIR = np.stack([256 - _WY_LUT, _WY_LUT])
+
 def analyze_weights():
     """分析权重计算的精度"""
     print("=" * 80)
@@ -81,17 +95,22 @@ def analyze_weights():
     
     print(f"\n最大误差: {max_y_error}, 相对误差: {(max_y_error/256)*100:.2f}%")
 
-def visualize_weights():
-    """可视化权重分布"""
+def visualize_weights(dpi=100):
+    """可视化权重分布（仅在 --plot 时调用）"""
+    # 仅在绘图时导入matplotlib，使用无GUI的Agg后端
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    
     # X方向权重
     local_x = np.arange(0, TILE_WIDTH)
-    wx_verilog = np.array([calc_weight_verilog(x, True) for x in local_x])
-    wx_ideal = np.array([calc_weight_ideal(x, TILE_WIDTH) for x in local_x])
+    wx_verilog = calc_weight_verilog_vec(local_x, True)
+    wx_ideal = (local_x * 256) // TILE_WIDTH
     
     # Y方向权重
     local_y = np.arange(0, TILE_HEIGHT)
-    wy_verilog = np.array([calc_weight_verilog(y, False) for y in local_y])
-    wy_ideal = np.array([calc_weight_ideal(y, TILE_HEIGHT) for y in local_y])
+    wy_verilog = calc_weight_verilog_vec(local_y, False)
+    wy_ideal = (local_y * 256) // TILE_HEIGHT
     
     # 绘图
     fig, axes = plt.subplots(2, 2, figsize=(14, 10))
@@ -135,7 +154,7 @@ def visualize_weights():
     axes[1, 1].grid(True)
     
     plt.tight_layout()
-    plt.savefig('weight_analysis.png', dpi=150)
+    plt.savefig('weight_analysis.png', dpi=dpi)
     print("\n权重分析图已保存到: weight_analysis.png")
 
 def test_bilinear_interp():
@@ -149,6 +168,7 @@ def test_bilinear_interp():
     cdf_tr = 150  # 右上tile
     cdf_bl = 120  # 左下tile
     cdf_br = 180  # 右下tile
+    cdf = np.array([[cdf_tl, cdf_tr], [cdf_bl, cdf_br]], dtype=np.int64)  # 按 [qy, qx] 排列
     
     print(f"\n假设4个tile的CDF值:")
     print(f"  左上(TL): {cdf_tl}")
@@ -170,15 +190,12 @@ def test_bilinear_interp():
     print("-" * 70)
     
     for local_x, local_y, desc in test_positions:
-        wx = calc_weight_verilog(local_x, True)
-        wy = calc_weight_verilog(local_y, False)
+        wx = int(WX_PAIR[1, local_x])
+        wy = int(WY_PAIR[1, local_y])
         
-        # 横向插值
-        interp_top = ((256 - wx) * cdf_tl + wx * cdf_tr) >> 8
-        interp_bottom = ((256 - wx) * cdf_bl + wx * cdf_br) >> 8
-        
-        # 纵向插值
-        result = ((256 - wy) * interp_top + wy * interp_bottom) >> 8
+        # 双线性插值：四个角权重直接查表，加权和只在最后右移16位，避免两级 >> 8 的中间截断
+        weights = np.outer(WY_PAIR[:, local_y].astype(np.int64), WX_PAIR[:, local_x])  # 256*256超出uint16
+        result = int((cdf * weights).sum()) >> 16
         
         print(f"  ({local_x:3d}, {local_y:3d})  | {wx:3d} | {wy:3d} |   {result:5.1f}   | {desc}")
 
@@ -221,10 +238,17 @@ def check_tile_boundary():
         print(f" {pixel_y:4d} |   {tile_y}    |  {local_y:3d}   | {wy:3d} | {'边界前' if local_y > 170 else '边界后' if local_y < 10 else '正常'}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CLAHE插值权重验证")
+    parser.add_argument('--plot', action=argparse.BooleanOptionalAction, default=False,
+                        help="生成权重分析图 weight_analysis.png（默认只输出分析结果）")
+    parser.add_argument('--dpi', type=int, default=100, help="分析图分辨率")
+    args = parser.parse_args()
+    
     analyze_weights()
     check_tile_boundary()
     test_bilinear_interp()
-    visualize_weights()
+    if args.plot:
+        visualize_weights(dpi=args.dpi)
     
     print("\n" + "=" * 80)
     print("分析完成！")
@@ -10,16 +10,47 @@ This script:
 4. Compares and generates verification report
 """
 
+import argparse
 import numpy as np
 import sys
-from collections import defaultdict
 
 class CLAHEGoldenModel:
     """CLAHE CDF计算的Golden Reference模型"""
     
-    def __init__(self, bins=256, tile_pixels=14400):
+    def __init__(self, bins=256, tile_pixels=14400, rounding='truncate'):
+        """
+        Args:
+            rounding: 归一化取整方式，'truncate'为截断取整，'nearest'为四舍五入
+        """
+        if rounding not in ('truncate', 'nearest'):
+            raise ValueError(f"rounding必须为'truncate'或'nearest'，实际为{rounding!r}")
         self.bins = bins
         self.tile_pixels = tile_pixels
+        self.rounding = rounding
+        # 预分配的工作缓冲区 (行数, bins)，NumPy路径在其上原地计算，按需扩容
+        self._clipped = np.empty((0, bins), dtype=np.int32)
+        self._cdf = np.empty((0, bins), dtype=np.int64)
+        self._bin_idx = np.arange(bins)
+        # Golden CDF缓存，键为 (直方图字节, clip_limit)
+        self._cache = {}
+    
+    def _scratch(self, rows):
+        """返回至少rows行的裁剪/CDF工作缓冲区视图，不足时扩容"""
+        if self._clipped.shape[0] < rows:
+            self._clipped = np.empty((rows, self.bins), dtype=np.int32)
+            self._cdf = np.empty((rows, self.bins), dtype=np.int64)
+        return self._clipped[:rows], self._cdf[:rows]
+    
+    def _normalize(self, cdf, cdf_min, denom):
+        """
+        整数归一化: (cdf - cdf_min) * 255 / denom，按self.rounding取整（支持按行广播）
+        
+        cdf_min之前的空bin结果为负，钳位为0（原浮点实现的astype(np.uint8)会回绕到227-255）
+        """
+        num = (cdf.astype(np.int64) - cdf_min) * 255
+        if self.rounding == 'nearest':
+            num += denom // 2
+        return (np.maximum(num, 0) // denom).astype(np.uint8)
     
     def calculate_cdf(self, histogram, clip_limit):
         """
@@ -32,84 +63,165 @@ class CLAHEGoldenModel:
         Returns:
             归一化的CDF值 (0-255范围)
         """
-        # 步骤1: Contrast Limiting (裁剪)
-        clipped_hist = np.copy(histogram).astype(np.int32)
-        total_excess = 0
+        # 单个tile视为1行批量计算，与calculate_cdf_batch共用同一实现（含空tile处理）
+        histogram = np.asarray(histogram, dtype=np.int32)
+        return self.calculate_cdf_batch(histogram[None], clip_limit)[0]
+    
+    def calculate_cdf_batch(self, H, C):
+        """
+        批量计算同一测试下所有tile的CDF值（与calculate_cdf逐行等价）
+        
+        Args:
+            H: 输入直方图 (T, 256)
+            C: Clip限制值
+            
+        Returns:
+            归一化的CDF值 (T, 256)，uint8
+        """
+        H = np.ascontiguousarray(H, dtype=np.int32)
+        out = np.zeros(H.shape, dtype=np.uint8)
+        
+        # 空tile（全零直方图）的CDF保持全零，只计算非空行
+        nonempty = H.any(axis=1)
+        if not nonempty.any():
+            return out
+        H = H[nonempty]
+        
+        # 裁剪并按行重分配超出量（在预分配缓冲区上原地计算）
+        clipped, cdf = self._scratch(len(H))
+        np.minimum(H, C, out=clipped, casting='unsafe')
+        excess = H.sum(axis=1, dtype=np.int64) - clipped.sum(axis=1, dtype=np.int64)
+        clipped += (excess // self.bins)[:, None]
+        clipped += self._bin_idx < (excess % self.bins)[:, None]
+        
+        # 逐行CDF与归一化
+        np.cumsum(clipped, axis=1, out=cdf)
+        first_nz = (cdf > 0).argmax(axis=1)
+        cdf_min = np.take_along_axis(cdf, first_nz[:, None], 1).squeeze(1)
+        total = cdf[:, -1]
+        
+        mask = total > cdf_min
+        normalized = np.zeros(cdf.shape, dtype=np.uint8)
+        normalized[mask] = self._normalize(cdf[mask], cdf_min[mask, None],
+                                           (total[mask] - cdf_min[mask])[:, None].astype(np.int64))
+        out[nonempty] = normalized
+        return out
+    
+    def self_check(self):
+        """
+        自检：用结果可手算的直方图核对Golden模型（由 --self-check 触发）
         
-        for i in range(self.bins):
-            if clipped_hist[i] > clip_limit:
-                excess = clipped_hist[i] - clip_limit
-                total_excess += excess
-                clipped_hist[i] = clip_limit
+        Returns:
+            bool: 全部用例与期望值一致时为True
+        """
+        half = 1 if self.rounding == 'nearest' else 0
+        cases = []
         
-        # 步骤2: 重分配超出量（均匀分配到所有bin）
-        avg_increment = total_excess // self.bins
-        remainder = total_excess % self.bins
+        # 空tile：CDF全零
+        cases.append(('empty tile', np.zeros(self.bins), 500, np.zeros(self.bins)))
         
-        for i in range(self.bins):
-            clipped_hist[i] += avg_increment
-            # 余数分配给前面的bin
-            if i < remainder:
-                clipped_hist[i] += 1
+        # 均匀直方图（每bin 56，未触发裁剪）：恒等映射 0..255
+        cases.append(('uniform', np.full(self.bins, 56), 500, np.arange(self.bins)))
         
-        # 步骤3: 计算CDF（累积分布函数）
-        cdf = np.cumsum(clipped_hist)
+        # h[50:60]=100：cdf_min之前的空bin为0，之后 k*255/9 上升，60起为255
+        h = np.zeros(self.bins)
+        h[50:60] = 100
+        exp = np.zeros(self.bins)
+        exp[50:60] = (np.arange(10) * 255 * 2 + 9 * half) // 18
+        exp[60:] = 255
+        cases.append(('leading empty bins', h, 500, exp))
         
-        # 步骤4: 归一化到0-255范围
-        # 使用CLAHE标准公式: normalized_cdf = (cdf - cdf_min) * 255 / (total - cdf_min)
-        cdf_min = cdf[0]
+        # 单峰h[0]=14400，clip 500：超出的13900按54/bin重分配，余数76给前76个bin
+        h = np.zeros(self.bins)
+        h[0] = self.tile_pixels
+        cdf = 555 + 55 * np.minimum(np.arange(self.bins), 75) \
+                  + 54 * np.maximum(np.arange(self.bins) - 75, 0)
+        exp = ((cdf - 555) * 255 * 2 + 13845 * half) // (13845 * 2)
+        cases.append(('single spike', h, 500, exp))
         
-        # 找到第一个非零CDF值
-        for i in range(self.bins):
-            if cdf[i] > 0:
-                cdf_min = cdf[i]
-                break
+        # 同一单峰，clip 10000（Test 7.1）：超出的4400按17/bin重分配，余数48
+        cdf = 10018 + 18 * np.minimum(np.arange(self.bins), 47) \
+                    + 17 * np.maximum(np.arange(self.bins) - 47, 0)
+        exp = ((cdf - 10018) * 255 * 2 + 4382 * half) // (4382 * 2)
+        cases.append(('single spike, high clip', h, 10000, exp))
         
-        total = cdf[-1]
+        ok = True
+        for name, h, clip_limit, exp in cases:
+            exp = np.asarray(exp, dtype=np.uint8)
+            scalar = self.calculate_cdf(h, clip_limit)
+            batch = self.calculate_cdf_batch(np.asarray(h)[None], clip_limit)[0]
+            for path, res in (('calculate_cdf', scalar), ('calculate_cdf_batch', batch)):
+                bad = np.flatnonzero(res != exp)
+                if bad.size:
+                    print(f"[SELF-CHECK] {name}: {path} differs at bins {bad[:5].tolist()} "
+                          f"(got {res[bad[:5]].tolist()}, expected {exp[bad[:5]].tolist()})")
+                    ok = False
+        return ok
+    
+    def calculate_cdf_cached(self, H, C):
+        """
+        带缓存的批量CDF计算：相同 (直方图, clip_limit) 的tile只计算一次
+        
+        Args:
+            H: 输入直方图 (T, 256)
+            C: Clip限制值
+            
+        Returns:
+            归一化的CDF值 (T, 256)，uint8
+        """
+        H = np.asarray(H, dtype=np.int32)
+        keys = [(row.tobytes(), C) for row in H]
         
-        if total == cdf_min or total == 0:
-            # 全零直方图
-            normalized_cdf = np.zeros(self.bins, dtype=np.uint8)
-        else:
-            # 归一化
-            normalized_cdf = ((cdf - cdf_min) * 255.0 / (total - cdf_min)).astype(np.uint8)
+        # 收集缓存未命中的直方图（同一批次内的重复只算一次）
+        todo = {}
+        for i, key in enumerate(keys):
+            if key not in self._cache and key not in todo:
+                todo[key] = i
+        if todo:
+            cdfs = self.calculate_cdf_batch(H[list(todo.values())], C)
+            self._cache.update(zip(todo, cdfs))
         
-        return normalized_cdf
+        if not keys:
+            return np.zeros((0, self.bins), dtype=np.uint8)
+        return np.stack([self._cache[key] for key in keys])
 
 
-def read_input_data(filename):
+def load_dense_data(filename, dtype):
     """
-    读取输入直方图数据
+    解析 "test_id tile_id bin_addr value" 格式的四列文本，并散射到稠密张量
     
     Returns:
-        dict: {test_id: {tile_id: histogram}}
+        tuple: (tests, present, data)
+            tests: 按升序排列的test_id数组
+            present: (测试数, tile数) 的bool数组，标记文件中出现过的 (test, tile)
+            data: (测试数, tile数, 256) 的数据张量，未出现的bin为0
     """
-    data = defaultdict(lambda: defaultdict(lambda: np.zeros(256, dtype=np.int32)))
+    raw = np.loadtxt(filename, dtype=np.int64, comments='#', ndmin=2)
+    if raw.size == 0:
+        return np.empty(0, dtype=np.int64), np.zeros((0, 0), dtype=bool), np.zeros((0, 0, 256), dtype=dtype)
     
-    print(f"Reading input data from {filename}...")
+    tests = np.unique(raw[:, 0])
+    test_idx = np.searchsorted(tests, raw[:, 0])
+    num_tiles = int(raw[:, 1].max()) + 1
     
-    with open(filename, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if line.startswith('#') or not line:
-                continue
-            
-            parts = line.split()
-            if len(parts) != 4:
-                continue
-            
-            try:
-                test_id = int(parts[0])
-                tile_id = int(parts[1])
-                bin_addr = int(parts[2])
-                value = int(parts[3])
-                
-                data[test_id][tile_id][bin_addr] = value
-            except ValueError:
-                continue
+    present = np.zeros((len(tests), num_tiles), dtype=bool)
+    present[test_idx, raw[:, 1]] = True
+    data = np.zeros((len(tests), num_tiles, 256), dtype=dtype)
+    data[test_idx, raw[:, 1], raw[:, 2]] = raw[:, 3]
+    return tests, present, data
+
+
+def read_input_data(filename):
+    """
+    读取输入直方图数据
     
-    print(f"  Loaded {len(data)} test cases")
-    return data
+    Returns:
+        tuple: (tests, present, histograms)，histograms形状为 (测试数, tile数, 256)
+    """
+    print(f"Reading input data from {filename}...")
+    tests, present, histograms = load_dense_data(filename, np.int32)
+    print(f"  Loaded {len(tests)} test cases")
+    return tests, present, histograms
 
 
 def read_output_data(filename):
@@ -117,71 +229,53 @@ def read_output_data(filename):
     读取实际CDF输出数据
     
     Returns:
-        dict: {test_id: {tile_id: {bin_addr: value}}}
+        tuple: (tests, present, cdfs)，cdfs形状为 (测试数, tile数, 256)
     """
-    data = defaultdict(lambda: defaultdict(dict))
-    
     print(f"Reading output data from {filename}...")
-    
-    with open(filename, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if line.startswith('#') or not line:
-                continue
-            
-            parts = line.split()
-            if len(parts) != 4:
-                continue
-            
-            try:
-                test_id = int(parts[0])
-                tile_id = int(parts[1])
-                bin_addr = int(parts[2])
-                value = int(parts[3])
-                
-                data[test_id][tile_id][bin_addr] = value
-            except ValueError:
-                continue
-    
-    print(f"  Loaded output data for {len(data)} test cases")
-    return data
+    tests, present, cdfs = load_dense_data(filename, np.int32)
+    print(f"  Loaded output data for {len(tests)} test cases")
+    return tests, present, cdfs
 
 
-def verify_test(test_id, golden_cdf, actual_output, tile_id=0):
+def verify_test(golden_cdf, actual_cdf):
     """
     验证单个测试用例
     
+    Args:
+        golden_cdf: Golden CDF (256个bin)
+        actual_cdf: 实际CDF输出 (256个bin)
+    
     Returns:
         dict: 验证结果统计
     """
-    mismatches = []
-    max_error = 0
-    
-    for bin_addr in range(256):
-        golden_val = golden_cdf[bin_addr]
-        actual_val = actual_output.get(bin_addr, 0)
-        
-        if golden_val != actual_val:
-            error = abs(int(golden_val) - int(actual_val))
-            mismatches.append({
-                'bin': bin_addr,
-                'golden': golden_val,
-                'actual': actual_val,
-                'error': error
-            })
-            max_error = max(max_error, error)
+    err = np.abs(golden_cdf.astype(np.int16) - actual_cdf.astype(np.int16))
+    bad = np.flatnonzero(err)
     
     return {
         'total_bins': 256,
-        'mismatches': len(mismatches),
-        'match_rate': (256 - len(mismatches)) / 256 * 100,
-        'max_error': max_error,
-        'mismatch_details': mismatches[:10]  # 只保留前10个
+        'mismatches': bad.size,
+        'match_rate': (256 - bad.size) / 256 * 100,
+        'max_error': int(err.max()) if bad.size else 0,
+        'mismatch_details': [  # 只保留前10个
+            {
+                'bin': int(b),
+                'golden': int(golden_cdf[b]),
+                'actual': int(actual_cdf[b]),
+                'error': int(err[b])
+            }
+            for b in bad[:10]
+        ]
     }
 
 
-def main():
-    """主验证流程"""
+def main(verbose=False, rounding='truncate'):
+    """
+    主验证流程
+    
+    Args:
+        verbose: 为True时打印每个tile的结果，否则只打印存在误差的tile
+        rounding: Golden模型归一化取整方式（'truncate' 或 'nearest'）
+    """
     
     print("=" * 80)
     print("CLAHE CDF Module - Golden Reference Verification")
@@ -189,82 +283,97 @@ def main():
     print()
     
     # 读取数据
-    input_data = read_input_data('cdf_input_data.txt')
-    output_data = read_output_data('cdf_output_data.txt')
+    in_tests, in_present, in_hists = read_input_data('cdf_input_data.txt')
+    out_tests, out_present, out_cdfs = read_output_data('cdf_output_data.txt')
     
     # 创建Golden模型
-    golden_model = CLAHEGoldenModel()
+    golden_model = CLAHEGoldenModel(rounding=rounding)
+    print(f"Golden rounding mode: {rounding}")
     
-    # 默认clip_limit (根据testbench)
-    clip_limits = {
-        1: 500,   # Test 1-6
-        2: 500,
-        3: 500,
-        4: 500,
-        5: 500,
-        6: 500,
-        7: 10000, # Test 7.1: 极高clip_limit
-        8: 500,   # Test 8
-        9: 500,   # Test 9
-    }
+    # 默认clip_limit (根据testbench)，按test_id直接索引
+    # Test 1-6, 8, 9 为500；未列出的test_id同样取500
+    clip_limits = np.full(max(int(in_tests.max(initial=0)), 9) + 1, 500, dtype=np.int32)
+    clip_limits[7] = 10000   # Test 7.1: 极高clip_limit
+    
+    if len(out_tests) == 0:
+        print("\n[ERROR] No output data found")
+        return 1
+    
+    # 按test_id对齐输入与输出，只比较两边都存在的 (test, tile)
+    o_idx = np.minimum(np.searchsorted(out_tests, in_tests), len(out_tests) - 1)
+    has_output = out_tests[o_idx] == in_tests
+    num_tiles = min(in_hists.shape[1], out_cdfs.shape[1])
+    checked = has_output[:, None] & in_present[:, :num_tiles] & out_present[o_idx, :num_tiles]
+    
+    # 计算所有测试的Golden CDF，得到 (测试数, tile数, 256) 张量
+    golden_all = np.zeros((len(in_tests), num_tiles, 256), dtype=np.uint8)
+    for t_idx, test_id in enumerate(in_tests.tolist()):
+        if has_output[t_idx]:
+            golden_all[t_idx] = golden_model.calculate_cdf_cached(
+                in_hists[t_idx, :num_tiles], int(clip_limits[test_id]))
+    actual_all = out_cdfs[o_idx, :num_tiles]
     
-    # 验证每个测试用例
-    total_tests = 0
-    passed_tests = 0
-    acceptable_tests = 0
-    failed_tests = 0
+    # 整个验证为一次张量差分，逐tile统计不匹配数与最大误差
+    err = np.abs(golden_all.astype(np.int16) - actual_all.astype(np.int16))
+    mm = (err > 0).sum(-1)
+    me = err.max(-1)
+    pass_mask = checked & (mm == 0)
+    acc_mask = checked & (mm > 0) & (me <= 1)
+    fail_mask = checked & ~(pass_mask | acc_mask)
+    
+    total_tests = int(checked.sum())
+    passed_tests = int(pass_mask.sum())
+    acceptable_tests = int(acc_mask.sum())
+    failed_tests = int(fail_mask.sum())
     
     print()
     print("=" * 80)
     print("Verification Results")
     print("=" * 80)
     
-    for test_id in sorted(input_data.keys()):
-        if test_id not in output_data:
+    # 逐tile循环只负责格式化输出
+    for t_idx, test_id in enumerate(in_tests.tolist()):
+        if not has_output[t_idx]:
             print(f"\n[WARNING] Test {test_id}: No output data found, skipping...")
             continue
         
-        for tile_id in sorted(input_data[test_id].keys()):
-            if tile_id not in output_data[test_id]:
-                continue
-            
-            # 获取clip_limit
-            clip_limit = clip_limits.get(test_id, 500)
-            
-            # 计算Golden CDF
-            histogram = input_data[test_id][tile_id]
-            golden_cdf = golden_model.calculate_cdf(histogram, clip_limit)
-            
-            # 验证
-            result = verify_test(test_id, golden_cdf, output_data[test_id][tile_id], tile_id)
+        clip_limit = int(clip_limits[test_id])
+        
+        # 非verbose模式只显示存在误差的tile
+        report = checked[t_idx] if verbose else fail_mask[t_idx] | acc_mask[t_idx]
+        
+        # 每个测试的输出先汇总到缓冲区，最后一次性写出
+        out = []
+        for tile_id in np.flatnonzero(report).tolist():
+            result = verify_test(golden_all[t_idx, tile_id], actual_all[t_idx, tile_id])
             
-            total_tests += 1
+            # 判定结果
+            if pass_mask[t_idx, tile_id]:
+                status = "✓ PASS - Perfect match!"
+            elif acc_mask[t_idx, tile_id]:
+                status = "⚠ ACCEPTABLE - Small rounding errors only"
+            else:
+                status = "✗ FAIL - Significant errors detected"
             
-            # 打印结果
-            print(f"\n[Test {test_id}, Tile {tile_id}]")
-            print(f"  Clip Limit        : {clip_limit}")
-            print(f"  Total bins checked: {result['total_bins']}")
-            print(f"  Mismatches found  : {result['mismatches']}")
-            print(f"  Match rate        : {result['match_rate']:.2f}%")
-            print(f"  Maximum error     : {result['max_error']}")
+            # 记录结果
+            out.append(f"\n[Test {test_id}, Tile {tile_id}]")
+            out.append(f"  Clip Limit        : {clip_limit}")
+            out.append(f"  Total bins checked: {result['total_bins']}")
+            out.append(f"  Mismatches found  : {result['mismatches']}")
+            out.append(f"  Match rate        : {result['match_rate']:.2f}%")
+            out.append(f"  Maximum error     : {result['max_error']}")
             
             # 显示不匹配的详细信息
             if result['mismatches'] > 0 and len(result['mismatch_details']) > 0:
-                print(f"  First mismatches:")
+                out.append(f"  First mismatches:")
                 for detail in result['mismatch_details'][:5]:
-                    print(f"    Bin[{detail['bin']:3d}]: Got {detail['actual']:3d}, "
-                          f"Expected {detail['golden']:3d}, Error = {detail['error']:3d}")
+                    out.append(f"    Bin[{detail['bin']:3d}]: Got {detail['actual']:3d}, "
+                               f"Expected {detail['golden']:3d}, Error = {detail['error']:3d}")
             
-            # 判定结果
-            if result['mismatches'] == 0:
-                print(f"  Status            : ✓ PASS - Perfect match!")
-                passed_tests += 1
-            elif result['max_error'] <= 1:
-                print(f"  Status            : ⚠ ACCEPTABLE - Small rounding errors only")
-                acceptable_tests += 1
-            else:
-                print(f"  Status            : ✗ FAIL - Significant errors detected")
-                failed_tests += 1
+            out.append(f"  Status            : {status}")
+        
+        if out:
+            sys.stdout.write('\n'.join(out) + '\n')
     
     # 总结
     print()
@@ -288,5 +397,19 @@ def main():
 
 
 if __name__ == '__main__':
-    sys.exit(main())
+    parser = argparse.ArgumentParser(description="CLAHE CDF模块Golden Reference验证")
+    parser.add_argument('--verbose', action=argparse.BooleanOptionalAction, default=False,
+                        help="打印每个tile的验证结果（默认只打印存在误差的tile）")
+    parser.add_argument('--rounding', choices=['truncate', 'nearest'], default='truncate',
+                        help="Golden CDF归一化取整方式：truncate向下截断（默认），nearest四舍五入")
+    parser.add_argument('--self-check', action=argparse.BooleanOptionalAction, default=False,
+                        help="只用已知结果的直方图自检Golden模型，不读取仿真数据")
+    args = parser.parse_args()
+    
+    if args.self_check:
+        ok = CLAHEGoldenModel(rounding=args.rounding).self_check()
+        print(f"Golden self-check ({args.rounding}): {'OK' if ok else 'FAILED'}")
+        sys.exit(0 if ok else 1)
+    
+    sys.exit(main(verbose=args.verbose, rounding=args.rounding))
 
@@ -4,11 +4,16 @@
 验证修复后的CLAHE插值权重计算
 """
 
+import argparse
+import sys
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.rcParams['font.sans-serif'] = ['SimHei']  # 使用黑体
-matplotlib.rcParams['axes.unicode_minus'] = False
+
+try:
+    from numba import njit
+except ImportError:
+    # numba为可选依赖，未安装时退回纯Python实现
+    def njit(*args, **kwargs):
+        return lambda func: func
 
 # 常量定义
 TILE_WIDTH = 320
@@ -16,33 +21,40 @@ TILE_HEIGHT = 180
 TILE_CENTER_X = 160
 TILE_CENTER_Y = 90
 
+@njit(cache=True)
 def calc_weight_fixed(dx_or_dy, is_x_axis):
     """
     修复后的权重计算 (模拟Verilog)
     wx = 128 + ((dx * 819) >> 10)
     wy = 128 + ((dy * 1456) >> 10)
+    Python的 >> 对负数向下取整，与Verilog有符号算术右移 $signed(x) >>> 10 一致
     """
-    if is_x_axis:
-        mult = dx_or_dy * 819
-        offset = mult >> 10  # 算术右移
-        # 符号扩展
-        if mult < 0:
-            offset = -((-mult) >> 10)
-        result = 128 + offset
-    else:
-        mult = dx_or_dy * 1456
-        offset = mult >> 10
-        if mult < 0:
-            offset = -((-mult) >> 10)
-        result = 128 + offset
-    
+    mult = dx_or_dy * (819 if is_x_axis else 1456)
     # 饱和到0-255
-    if result < 0:
-        return 0
-    elif result > 255:
-        return 255
-    else:
-        return result
+    return max(0, min(255, 128 + (mult >> 10)))
+
+# 权重查找表：按local坐标索引，饱和已固化在表中
+WX_LUT = np.array([calc_weight_fixed(x - TILE_CENTER_X, True) for x in range(TILE_WIDTH)], dtype=np.uint8)
+WY_LUT = np.array([calc_weight_fixed(y - TILE_CENTER_Y, False) for y in range(TILE_HEIGHT)], dtype=np.uint8)
+
+def check_weight_luts():
+    """
+    自检：查找表在关键位置取RTL移位运算的已知结果（由 --self-check 触发）
+    
+    wx = 128 + ((dx * 819) >> 10)、wy = 128 + ((dy * 1456) >> 10)，算术右移向下取整，饱和到0-255
+    """
+    expected_x = {-160: 0, -1: 127, 0: 128, 159: 255}    # -131040>>10=-128, -819>>10=-1, 130221>>10=127
+    expected_y = {-90: 0, -1: 126, 0: 128, 89: 254}      # -131040>>10=-128, -1456>>10=-2, 129584>>10=126
+    
+    ok = True
+    for name, lut, center, expected in (('WX_LUT', WX_LUT, TILE_CENTER_X, expected_x),
+                                        ('WY_LUT', WY_LUT, TILE_CENTER_Y, expected_y)):
+        for d, want in expected.items():
+            got = int(lut[center + d])
+            mark = '✓' if got == want else '✗'
+            print(f"  {name}[d={d:4d}] = {got:3d}  期望 {want:3d}  {mark}")
+            ok &= got == want
+    return ok
 
 def analyze_fixed_weights():
     """分析修复后的权重"""
@@ -62,7 +74,7 @@ def analyze_fixed_weights():
     for local_x in critical_x:
         if local_x < 320:
             dx = local_x - TILE_CENTER_X
-            wx_fixed = calc_weight_fixed(dx, True)
+            wx_fixed = int(WX_LUT[local_x])
             # 期望：在tile中心=128，左边界≈0，右边界≈255
             if local_x == 0:
                 expected = "≈0 (左边界)"
@@ -89,7 +101,7 @@ def analyze_fixed_weights():
     
     for pixel_x, tile_x, local_x in boundary_pixels:
         dx = local_x - TILE_CENTER_X
-        wx = calc_weight_fixed(dx, True)
+        wx = int(WX_LUT[local_x])
         
         if pixel_x == 319:
             note = "✓ Tile0右边界，wx≈255"
@@ -112,7 +124,7 @@ def analyze_fixed_weights():
     for local_y in critical_y:
         if local_y < 180:
             dy = local_y - TILE_CENTER_Y
-            wy_fixed = calc_weight_fixed(dy, False)
+            wy_fixed = int(WY_LUT[local_y])
             
             if local_y == 0:
                 expected = "≈0 (上边界)"
@@ -125,22 +137,20 @@ def analyze_fixed_weights():
             
             print(f"  {local_y:3d}   | {dy:4d} |   {wy_fixed:3d}    |  {expected:12s} | {'✓ 边界平滑' if local_y in [0, 179] else ''}")
 
-def visualize_fixed_weights():
-    """可视化修复后的权重分布"""
+def visualize_fixed_weights(dpi=100):
+    """可视化修复后的权重分布（仅在 --plot 时调用）"""
+    # 仅在绘图时导入matplotlib，使用无GUI的Agg后端
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    matplotlib.rcParams['font.sans-serif'] = ['SimHei']  # 使用黑体
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    
     fig, axes = plt.subplots(2, 3, figsize=(16, 10))
     
     # X方向：跨越两个tile的权重分布
     pixel_x = np.arange(0, 640)  # Tile 0和Tile 1
-    wx_values = []
-    tile_ids = []
-    
-    for px in pixel_x:
-        tile_x = px // TILE_WIDTH
-        local_x = px % TILE_WIDTH
-        dx = local_x - TILE_CENTER_X
-        wx = calc_weight_fixed(dx, True)
-        wx_values.append(wx)
-        tile_ids.append(tile_x)
+    wx_values = WX_LUT[pixel_x % TILE_WIDTH]
     
     # 绘制X方向权重
     axes[0, 0].plot(pixel_x, wx_values, 'b-', linewidth=2)
@@ -155,13 +165,7 @@ def visualize_fixed_weights():
     
     # X方向：放大tile边界
     boundary_x = np.arange(300, 340)
-    boundary_wx = []
-    for px in boundary_x:
-        tile_x = px // TILE_WIDTH
-        local_x = px % TILE_WIDTH
-        dx = local_x - TILE_CENTER_X
-        wx = calc_weight_fixed(dx, True)
-        boundary_wx.append(wx)
+    boundary_wx = WX_LUT[boundary_x % TILE_WIDTH]
     
     axes[0, 1].plot(boundary_x, boundary_wx, 'b-', linewidth=2, marker='o', markersize=4)
     axes[0, 1].axvline(320, color='r', linestyle='--', linewidth=2, label='Tile边界')
@@ -172,7 +176,7 @@ def visualize_fixed_weights():
     axes[0, 1].grid(True, alpha=0.3)
     
     # 权重梯度 (验证平滑性)
-    gradient = np.diff(boundary_wx)
+    gradient = np.diff(boundary_wx.astype(np.int16))  # 查找表为uint8，先转有符号避免回绕
     axes[0, 2].plot(boundary_x[:-1], gradient, 'g-', linewidth=2, marker='s', markersize=4)
     axes[0, 2].axvline(320, color='r', linestyle='--', linewidth=2, label='Tile边界')
     axes[0, 2].axhline(0, color='k', linestyle='-', linewidth=0.5)
@@ -184,14 +188,7 @@ def visualize_fixed_weights():
     
     # Y方向类似
     pixel_y = np.arange(0, 360)  # Tile 0和Tile 1
-    wy_values = []
-    
-    for py in pixel_y:
-        tile_y = py // TILE_HEIGHT
-        local_y = py % TILE_HEIGHT
-        dy = local_y - TILE_CENTER_Y
-        wy = calc_weight_fixed(dy, False)
-        wy_values.append(wy)
+    wy_values = WY_LUT[pixel_y % TILE_HEIGHT]
     
     axes[1, 0].plot(pixel_y, wy_values, 'b-', linewidth=2)
     axes[1, 0].axvline(180, color='r', linestyle='--', linewidth=2, label='Tile边界')
@@ -205,13 +202,7 @@ def visualize_fixed_weights():
     
     # Y方向边界放大
     boundary_y = np.arange(165, 195)
-    boundary_wy = []
-    for py in boundary_y:
-        tile_y = py // TILE_HEIGHT
-        local_y = py % TILE_HEIGHT
-        dy = local_y - TILE_CENTER_Y
-        wy = calc_weight_fixed(dy, False)
-        boundary_wy.append(wy)
+    boundary_wy = WY_LUT[boundary_y % TILE_HEIGHT]
     
     axes[1, 1].plot(boundary_y, boundary_wy, 'b-', linewidth=2, marker='o', markersize=4)
     axes[1, 1].axvline(180, color='r', linestyle='--', linewidth=2, label='Tile边界')
@@ -221,16 +212,11 @@ def visualize_fixed_weights():
     axes[1, 1].legend()
     axes[1, 1].grid(True, alpha=0.3)
     
-    # 2D权重热力图 (tile中心附近)
+    # 2D权重热力图 (tile中心附近)，wx只与local_x有关，沿Y方向广播
     x_range = np.arange(0, 320)
     y_range = np.arange(0, 180)
-    wx_2d = np.zeros((len(y_range), len(x_range)))
-    
-    for i, local_y in enumerate(y_range):
-        for j, local_x in enumerate(x_range):
-            dx = local_x - TILE_CENTER_X
-            wx = calc_weight_fixed(dx, True)
-            wx_2d[i, j] = wx
+    wx_row = WX_LUT[x_range]
+    wx_2d = np.broadcast_to(wx_row, (len(y_range), len(x_range)))
     
     im = axes[1, 2].imshow(wx_2d, cmap='viridis', aspect='auto', origin='lower')
     axes[1, 2].axvline(TILE_CENTER_X, color='r', linestyle='--', linewidth=1, label='中心X')
@@ -240,12 +226,27 @@ def visualize_fixed_weights():
     plt.colorbar(im, ax=axes[1, 2], label='权重值')
     
     plt.tight_layout()
-    plt.savefig('fixed_weight_analysis.png', dpi=150, bbox_inches='tight')
+    plt.savefig('fixed_weight_analysis.png', dpi=dpi, bbox_inches='tight')
     print("\n修复后的权重分析图已保存: fixed_weight_analysis.png")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="修复后的CLAHE插值权重验证")
+    parser.add_argument('--plot', action=argparse.BooleanOptionalAction, default=False,
+                        help="生成权重分析图 fixed_weight_analysis.png（默认只输出分析结果）")
+    parser.add_argument('--dpi', type=int, default=100, help="分析图分辨率")
+    parser.add_argument('--self-check', action=argparse.BooleanOptionalAction, default=False,
+                        help="只核对查找表关键位置的已知权重值，不运行分析")
+    args = parser.parse_args()
+    
+    if args.self_check:
+        print("查找表自检:")
+        ok = check_weight_luts()
+        print(f"查找表自检{'通过' if ok else '失败'}")
+        sys.exit(0 if ok else 1)
+    
     analyze_fixed_weights()
-    visualize_fixed_weights()
+    if args.plot:
+        visualize_fixed_weights(dpi=args.dpi)
     
     print("\n" + "=" * 80)
     print("✓ 权重修复验证完成！")
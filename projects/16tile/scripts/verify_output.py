@@ -1,6 +1,8 @@
 import numpy as np
 from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
 import os
+import struct
 
 print("=" * 60)
 print("CLAHE Output Image Analysis")
@@ -8,52 +10,98 @@ print("=" * 60)
 
 output_dir = "bmp_test_results/output"
 
-for i in range(6):
+def read_bmp(filepath):
+    """24位未压缩BMP直接内存映射为(H, W, 3)的RGB数组，其他格式回退到PIL"""
+    with open(filepath, 'rb') as f:
+        header = f.read(54)
+    if len(header) == 54 and header[:2] == b'BM':
+        offset, = struct.unpack_from('<I', header, 10)
+        width, height = struct.unpack_from('<ii', header, 18)
+        bpp, compression = struct.unpack_from('<HI', header, 28)
+        if bpp == 24 and compression == 0:
+            rows = abs(height)
+            row_size = (width * 3 + 3) & ~3  # 每行4字节对齐
+            raw = np.memmap(filepath, dtype=np.uint8, mode='r', offset=offset, shape=(rows, row_size))
+            pixels = raw[:, :width * 3].reshape(rows, width, 3)[..., ::-1]  # BGR -> RGB
+            if height > 0:
+                pixels = pixels[::-1]  # 自下而上存储，翻转为自上而下
+            return pixels, (width, rows), 'RGB'
+    img = Image.open(filepath)
+    return np.asarray(img), img.size, img.mode
+
+def luma(pixels):
+    """RGB块转亮度，灰度块直接返回"""
+    if len(pixels.shape) == 3:
+        # 整数BT.601亮度，使用testbench中的四舍五入公式（与check_bmp_content.py一致）:
+        # (19595*R + 38470*G + 7471*B + 32768) >> 16，uint32中间值避免float64临时数组
+        rgb = pixels[:,:,:3].astype(np.uint32)
+        return ((19595 * rgb[:,:,0] + 38470 * rgb[:,:,1] + 7471 * rgb[:,:,2] + 32768) >> 16).astype(np.uint8)
+    return pixels
+
+def analyze_frame(i, block_rows=64):
+    """统计单帧输出图像，返回待打印的行"""
     filename = f"output_frame {i}.bmp"
     filepath = os.path.join(output_dir, filename)
     
     if not os.path.exists(filepath):
-        print(f"\n[Frame {i}] File not found: {filename}")
-        continue
+        return [f"\n[Frame {i}] File not found: {filename}"]
     
+    out = []
     try:
-        img = Image.open(filepath)
-        img_array = np.array(img)
+        img_array, size, mode = read_bmp(filepath)
         
-        # 统计信息
-        if len(img_array.shape) == 3:
-            # RGB图像
-            r, g, b = img_array[:,:,0], img_array[:,:,1], img_array[:,:,2]
-            y = 0.299 * r + 0.587 * g + 0.114 * b  # 转换为亮度
-        else:
-            # 灰度图像
-            y = img_array
+        # 按行块流式统计，内存映射的BMP每次只读入block_rows行，峰值内存与帧大小无关
+        total_pixels = 0
+        zero_pixels = 0
+        y_sum = 0
+        y_sqsum = 0
+        y_min = 255
+        y_max = 0
+        samples = []  # 前5个非零像素 (行, 列, Y)
+        for y0 in range(0, img_array.shape[0], block_rows):
+            y = luma(img_array[y0:y0 + block_rows])
+            y64 = y.astype(np.int64)
+            total_pixels += y.size
+            zero_pixels += int((y == 0).sum())
+            y_sum += int(y64.sum())
+            y_sqsum += int((y64 * y64).sum())
+            y_min = min(y_min, int(y.min()))
+            y_max = max(y_max, int(y.max()))
+            
+            # 采样几个像素值：逐行查找，找到5个非零像素即停止
+            if len(samples) < 5:
+                for r, row in enumerate(y):
+                    for sx in np.flatnonzero(row)[:5 - len(samples)]:
+                        samples.append((y0 + r, sx, row[sx]))
+                    if len(samples) == 5:
+                        break
         
-        total_pixels = y.size
-        zero_pixels = np.sum(y == 0)
         nonzero_pixels = total_pixels - zero_pixels
+        y_mean = y_sum / total_pixels
+        y_std = max(y_sqsum / total_pixels - y_mean * y_mean, 0.0) ** 0.5
         
-        print(f"\n[Frame {i}] {filename}")
-        print(f"  Size: {img.size}")
-        print(f"  Mode: {img.mode}")
-        print(f"  Total pixels: {total_pixels}")
-        print(f"  Zero pixels: {zero_pixels} ({100*zero_pixels/total_pixels:.2f}%)")
-        print(f"  Non-zero pixels: {nonzero_pixels} ({100*nonzero_pixels/total_pixels:.2f}%)")
-        print(f"  Min/Max/Mean: {y.min():.1f} / {y.max():.1f} / {y.mean():.1f}")
-        print(f"  Std Dev: {y.std():.2f}")
+        out.append(f"\n[Frame {i}] {filename}")
+        out.append(f"  Size: {size}")
+        out.append(f"  Mode: {mode}")
+        out.append(f"  Total pixels: {total_pixels}")
+        out.append(f"  Zero pixels: {zero_pixels} ({100*zero_pixels/total_pixels:.2f}%)")
+        out.append(f"  Non-zero pixels: {nonzero_pixels} ({100*nonzero_pixels/total_pixels:.2f}%)")
+        out.append(f"  Min/Max/Mean: {y_min:.1f} / {y_max:.1f} / {y_mean:.1f}")
+        out.append(f"  Std Dev: {y_std:.2f}")
         
-        # 采样几个像素值
-        if nonzero_pixels > 0:
-            sample_indices = np.where(y > 0)
-            if len(sample_indices[0]) > 0:
-                sample_y = sample_indices[0][:5]
-                sample_x = sample_indices[1][:5]
-                print(f"  First 5 non-zero pixels:")
-                for sy, sx in zip(sample_y, sample_x):
-                    print(f"    ({sy},{sx}): Y={y[sy,sx]:.0f}")
+        if samples:
+            out.append(f"  First 5 non-zero pixels:")
+            for sy, sx, sv in samples:
+                out.append(f"    ({sy},{sx}): Y={sv:.0f}")
         
     except Exception as e:
-        print(f"\n[Frame {i}] Error reading {filename}: {e}")
+        out.append(f"\n[Frame {i}] Error reading {filename}: {e}")
+    return out
+
+# 各帧相互独立，I/O与NumPy计算可在线程池中重叠；结果按帧顺序打印
+with ThreadPoolExecutor() as ex:
+    for lines in ex.map(analyze_frame, range(6)):
+        print("\n".join(lines))
 
 print("\n" + "=" * 60)
 print("Analysis Complete")
@@ -6,6 +6,9 @@ PNG转BMP脚本
 """
 
 from PIL import Image
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import io
 import os
 
 def convert_png_to_bmp(png_path, bmp_path):
@@ -28,14 +31,11 @@ def convert_png_to_bmp(png_path, bmp_path):
             print(f"  转换模式: {img.mode} -> RGB")
             img = img.convert('RGB')
         
-        # 保存为24位BMP
+        # 保存为24位BMP（保存失败会直接抛出异常，无需重新打开验证）
         img.save(bmp_path, 'BMP')
         print(f"成功保存BMP: {bmp_path}")
-        
-        # 验证保存的BMP文件
-        bmp_img = Image.open(bmp_path)
-        print(f"  BMP尺寸: {bmp_img.size}")
-        print(f"  BMP模式: {bmp_img.mode}")
+        print(f"  BMP尺寸: {img.size}")
+        print(f"  BMP模式: {img.mode}")
         
         return True
         
@@ -43,6 +43,14 @@ def convert_png_to_bmp(png_path, bmp_path):
         print(f"转换失败: {e}")
         return False
 
+def _convert_worker(paths):
+    """进程池工作函数：转换单个文件并收集其输出，由主进程统一打印"""
+    png_path, bmp_path = paths
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        ok = convert_png_to_bmp(png_path, bmp_path)
+    return ok, log.getvalue()
+
 def batch_convert(input_dir, output_dir):
     """
     批量转换目录下的所有PNG文件
@@ -69,16 +77,23 @@ def batch_convert(input_dir, output_dir):
     
     print(f"\n开始转换...\n")
     
+    tasks = [(os.path.join(input_dir, f),
+              os.path.join(output_dir, os.path.splitext(f)[0] + '.bmp'))
+             for f in png_files]
+    
+    # 各文件相互独立，使用进程池并行转换
+    ncpu = os.cpu_count() or 1
+    chunksize = max(1, len(tasks) // (4 * ncpu))
+    
     success_count = 0
-    for png_file in png_files:
-        png_path = os.path.join(input_dir, png_file)
-        bmp_file = os.path.splitext(png_file)[0] + '.bmp'
-        bmp_path = os.path.join(output_dir, bmp_file)
-        
-        print(f"[{success_count+1}/{len(png_files)}]", end=" ")
-        if convert_png_to_bmp(png_path, bmp_path):
-            success_count += 1
-        print()
+    with ProcessPoolExecutor(max_workers=ncpu) as ex:
+        results = ex.map(_convert_worker, tasks, chunksize=chunksize)
+        for i, (ok, log) in enumerate(results, 1):
+            print(f"[{i}/{len(png_files)}]", end=" ")
+            print(log, end="")
+            if ok:
+                success_count += 1
+            print()
     
     print(f"\n转换完成: {success_count}/{len(png_files)} 成功")
 
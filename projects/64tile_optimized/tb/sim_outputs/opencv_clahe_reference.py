@@ -12,7 +12,12 @@ OpenCV标准CLAHE参考实现
 
 import cv2
 import numpy as np
+import contextlib
+import functools
+import io
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from PIL import Image
 
@@ -20,7 +25,56 @@ from PIL import Image
 from PIL import ImageFile
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
-def process_clahe_opencv(input_path, output_path, clip_limit=3.0, tile_size=(64, 64)):
+@functools.lru_cache(maxsize=None)
+def _cuda_available():
+    """
+    检测当前OpenCV是否带CUDA支持且存在可用设备
+    
+    在处理帧时才调用（即在工作进程内），避免主进程在创建进程池之前初始化CUDA
+    """
+    try:
+        return hasattr(cv2, 'cuda') and cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except cv2.error:
+        return False
+
+@functools.lru_cache(maxsize=8)
+def _get_clahe(clip_limit, tw, th):
+    """按参数缓存CLAHE对象，批处理中复用（多进程时每个进程各自构造一次）"""
+    return cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tw, th))
+
+@functools.lru_cache(maxsize=8)
+def _get_clahe_cuda(clip_limit, tw, th):
+    """CUDA版本的CLAHE对象缓存"""
+    return cv2.cuda.createCLAHE(clipLimit=clip_limit, tileGridSize=(tw, th))
+
+# 帧数少于该值时串行处理，避免进程池启动开销
+PARALLEL_MIN_FILES = 4
+
+def read_gray(path):
+    """
+    以灰度读取BMP为uint8数组
+    
+    优先使用cv2.imread；cv2无法解码时（如仿真期间未完全写入的截断BMP）退回PIL读取，
+    缺失部分按PIL的LOAD_TRUNCATED_IMAGES行为补齐
+    
+    彩色图按testbench公式 (19595*R + 38470*G + 7471*B + 32768) >> 16 转换为亮度
+    （与PIL convert('L')逐位一致；cv2的IMREAD_GRAYSCALE取整方式不同，不能直接使用）
+    """
+    img = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+    if img is None:
+        return np.asarray(Image.open(path).convert('L'))
+    if img.ndim == 3:
+        bgr = img[..., :3].astype(np.uint32)
+        img = ((19595 * bgr[..., 2] + 38470 * bgr[..., 1] + 7471 * bgr[..., 0] + 32768) >> 16).astype(np.uint8)
+    return img
+
+def _frame_stats(img):
+    """一次meanStdDev + 一次minMaxLoc得到均值、标准差与范围"""
+    mean, std = cv2.meanStdDev(img)
+    min_v, max_v, _, _ = cv2.minMaxLoc(img)
+    return mean[0, 0], std[0, 0], int(min_v), int(max_v)
+
+def process_clahe_opencv(input_path, output_path, clip_limit=3.0, tile_size=(64, 64), quiet=False):
     """
     使用OpenCV标准CLAHE处理图像
     
@@ -29,49 +83,63 @@ def process_clahe_opencv(input_path, output_path, clip_limit=3.0, tile_size=(64,
         output_path: 输出BMP文件路径
         clip_limit: 裁剪限制（硬件默认为3）
         tile_size: 每个tile的像素尺寸，对于512x512图像和8x8 tiles，每个tile是64x64
+        quiet: 为True时跳过输入/输出统计信息
     """
     try:
-        # 使用PIL读取图像（更好的BMP支持）
-        pil_img = Image.open(input_path)
-        
-        # 转换为灰度图
-        if pil_img.mode != 'L':
-            pil_img = pil_img.convert('L')
-        
-        # 转换为numpy数组供OpenCV使用
-        img = np.array(pil_img)
+        # 以灰度读取为uint8数组（截断文件退回PIL）
+        img = read_gray(input_path)
         
         # 创建CLAHE对象 (自动计算tile大小)
         # 对于不同的图像尺寸，保持8x8 tiles
-        clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(8, 8))
-        
-        # 应用CLAHE
-        enhanced = clahe.apply(img)
+        use_cuda = _cuda_available()
+        if use_cuda:
+            # GPU路径：上传、CLAHE、下载在同一stream上异步执行
+            clahe = _get_clahe_cuda(clip_limit, 8, 8)
+            stream = cv2.cuda_Stream()
+            g_src = cv2.cuda_GpuMat()
+            g_src.upload(img, stream)
+            g_dst = clahe.apply(g_src, stream)
+            enhanced = g_dst.download(stream=stream)
+            stream.waitForCompletion()
+        else:
+            clahe = _get_clahe(clip_limit, 8, 8)
+            
+            # 应用CLAHE
+            enhanced = clahe.apply(img)
         
         # 保存结果
-        enhanced_pil = Image.fromarray(enhanced)
-        enhanced_pil.save(output_path)
+        if not cv2.imwrite(str(output_path), enhanced):
+            raise IOError("cv2.imwrite保存失败")
         
     except Exception as e:
         print(f"❌ 处理图像失败: {input_path}")
         print(f"   错误: {e}")
         return False
     
+    print(f"✓ {os.path.basename(input_path):25s} -> {os.path.basename(output_path):25s} [{'CUDA' if use_cuda else 'CPU'}]")
+    if quiet:
+        return True
+    
     # 统计信息
-    input_mean = np.mean(img)
-    input_std = np.std(img)
-    output_mean = np.mean(enhanced)
-    output_std = np.std(enhanced)
+    input_mean, input_std, input_min, input_max = _frame_stats(img)
+    output_mean, output_std, output_min, output_max = _frame_stats(enhanced)
     
-    print(f"✓ {os.path.basename(input_path):25s} -> {os.path.basename(output_path):25s}")
-    print(f"  输入: 均值={input_mean:6.2f}, 标准差={input_std:6.2f}, 范围=[{img.min():3d}, {img.max():3d}]")
-    print(f"  输出: 均值={output_mean:6.2f}, 标准差={output_std:6.2f}, 范围=[{enhanced.min():3d}, {enhanced.max():3d}]")
+    print(f"  输入: 均值={input_mean:6.2f}, 标准差={input_std:6.2f}, 范围=[{input_min:3d}, {input_max:3d}]")
+    print(f"  输出: 均值={output_mean:6.2f}, 标准差={output_std:6.2f}, 范围=[{output_min:3d}, {output_max:3d}]")
     
     return True
 
-def batch_process(input_dir, output_dir, clip_limit=3.0):
+def _clahe_worker(args):
+    """进程池工作函数：处理单帧并收集其输出，由主进程统一打印"""
+    input_path, output_path, clip_limit, quiet = args
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        ok = process_clahe_opencv(input_path, output_path, clip_limit, quiet=quiet)
+    return ok, log.getvalue()
+
+def batch_process(input_dir, output_dir, clip_limit=3.0, quiet=False):
     """
-    批量处理文件夹中的所有frame_input图像
+    批量处理文件夹中的所有frame_input图像（quiet为True时不输出每帧统计信息）
     """
     input_dir = Path(input_dir)
     output_dir = Path(output_dir)
@@ -96,16 +164,30 @@ def batch_process(input_dir, output_dir, clip_limit=3.0):
     print("=" * 80)
     print()
     
+    # 生成输出文件名（将frame_input替换为frame_opencv）
+    tasks = [(str(input_file),
+              str(opencv_output_dir / input_file.name.replace("frame_input", "frame_opencv")),
+              clip_limit, quiet)
+             for input_file in input_files]
+    
     success_count = 0
     
-    for input_file in input_files:
-        # 生成输出文件名（将frame_input替换为frame_opencv）
-        output_filename = input_file.name.replace("frame_input", "frame_opencv")
-        output_file = opencv_output_dir / output_filename
-        
-        if process_clahe_opencv(str(input_file), str(output_file), clip_limit):
-            success_count += 1
-        print()
+    # 各帧相互独立，帧数较多时使用进程池并行处理
+    if len(tasks) < PARALLEL_MIN_FILES:
+        results = map(_clahe_worker, tasks)
+        pool = contextlib.nullcontext()
+    else:
+        ncpu = os.cpu_count() or 1
+        # 使用spawn启动工作进程：CUDA不支持在fork出的子进程中使用
+        pool = ProcessPoolExecutor(max_workers=ncpu, mp_context=multiprocessing.get_context('spawn'))
+        results = pool.map(_clahe_worker, tasks, chunksize=max(1, len(tasks) // (4 * ncpu)))
+    
+    with pool:
+        for ok, log in results:
+            print(log, end="")
+            if ok:
+                success_count += 1
+            print()
     
     print("=" * 80)
     print(f"处理完成: {success_count}/{len(input_files)} 个文件")
@@ -125,21 +207,20 @@ def compare_images(opencv_path, hardware_path):
     对比OpenCV结果和硬件结果
     """
     try:
-        opencv_pil = Image.open(opencv_path).convert('L')
-        hardware_pil = Image.open(hardware_path).convert('L')
-        opencv_img = np.array(opencv_pil)
-        hardware_img = np.array(hardware_pil)
+        opencv_img = read_gray(opencv_path)
+        hardware_img = read_gray(hardware_path)
     except Exception as e:
         print(f"❌ 无法读取对比图像: {e}")
         return
     
-    # 计算差异
+    # 计算差异（OpenCV单遍归约，不生成中间布尔数组）
     diff = cv2.absdiff(opencv_img, hardware_img)
-    max_diff = np.max(diff)
-    mean_diff = np.mean(diff)
+    _, max_diff, _, _ = cv2.minMaxLoc(diff)
+    max_diff = int(max_diff)
+    mean_diff = cv2.mean(diff)[0]
     
     # 统计差异像素
-    diff_pixels = np.sum(diff > 0)
+    diff_pixels = cv2.countNonZero(diff)
     total_pixels = opencv_img.size
     diff_ratio = diff_pixels / total_pixels * 100
     
@@ -160,24 +241,28 @@ def compare_images(opencv_path, hardware_path):
 if __name__ == "__main__":
     import sys
     
+    # --quiet: 跳过每帧的统计信息
+    quiet = '--quiet' in sys.argv[1:]
+    argv = [arg for arg in sys.argv[1:] if arg != '--quiet']
+    
     # 默认使用当前目录（如果在sim_outputs下运行）
-    if len(sys.argv) > 1:
-        input_dir = sys.argv[1]
+    if len(argv) > 0:
+        input_dir = argv[0]
     else:
         input_dir = "."  # 当前目录
     
-    if len(sys.argv) > 2:
-        output_dir = sys.argv[2]
+    if len(argv) > 1:
+        output_dir = argv[1]
     else:
         output_dir = input_dir  # 输出到同一目录
     
-    if len(sys.argv) > 3:
-        clip_limit = float(sys.argv[3])
+    if len(argv) > 2:
+        clip_limit = float(argv[2])
     else:
         clip_limit = 3.0  # 硬件默认值
     
     # 批量处理
-    opencv_output_dir = batch_process(input_dir, output_dir, clip_limit)
+    opencv_output_dir = batch_process(input_dir, output_dir, clip_limit, quiet)
     
     # 如果存在硬件输出，进行对比
     input_path = Path(input_dir)